@@ -0,0 +1,369 @@
+"""Compiled kernels for the per-reading analysis loops.
+
+Numba is optional. Indexing NumPy arrays element by element from plain
+Python is the slowest way to run these loops, so without it each kernel
+has a separate list-based or vectorized fallback with the same signature
+and results.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover - exercised only without numba
+    HAVE_NUMBA = False
+
+# Episode type codes returned by the kernels
+NONE = 0
+LOW = 1
+VERY_LOW = 2
+HIGH = 3
+VERY_HIGH = 4
+
+EPISODE_TYPES = {
+    LOW: "low",
+    VERY_LOW: "very_low",
+    HIGH: "high",
+    VERY_HIGH: "very_high",
+}
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _range_counts(vals, low, high):
+        """Count readings per glucose range in a single pass.
+
+        Returns:
+            (very_low, below, in_range, above, very_high) - readings < 54,
+            < low, low-high inclusive, > high and > 250 mg/dL.
+        """
+        very_low = below = in_range = above = very_high = 0
+        for v in vals:
+            if v < 54:
+                very_low += 1
+            if v < low:
+                below += 1
+            if low <= v <= high:
+                in_range += 1
+            if v > high:
+                above += 1
+            if v > 250:
+                very_high += 1
+        return very_low, below, in_range, above, very_high
+else:
+    def _range_counts(vals, low, high):
+        """NumPy fallback for _range_counts, one vectorized comparison per range."""
+        return (
+            int((vals < 54).sum()),
+            int((vals < low).sum()),
+            int(((vals >= low) & (vals <= high)).sum()),
+            int((vals > high).sum()),
+            int((vals > 250).sum()),
+        )
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _find_episodes(vals, low, high):
+        """Find runs of out-of-range readings in chronologically ordered values.
+
+        Adjacent readings on the same side of the range are merged into one
+        episode; an episode is upgraded to very_low/very_high if any of its
+        readings crosses 54/250 mg/dL.
+
+        Returns:
+            (types, start_idx, end_idx) - parallel arrays, one entry per episode,
+            with inclusive start/end indices into ``vals``.
+        """
+        n = vals.shape[0]
+
+        kinds = np.empty(n, dtype=np.int8)
+        for i in range(n):
+            v = vals[i]
+            if v < 54:
+                kinds[i] = VERY_LOW
+            elif v < low:
+                kinds[i] = LOW
+            elif v > 250:
+                kinds[i] = VERY_HIGH
+            elif v > high:
+                kinds[i] = HIGH
+            else:
+                kinds[i] = NONE
+
+        types = np.empty(n, dtype=np.int8)
+        start_idx = np.empty(n, dtype=np.int64)
+        end_idx = np.empty(n, dtype=np.int64)
+        count = 0
+
+        i = 0
+        while i < n:
+            kind = kinds[i]
+            if kind == NONE:
+                i += 1
+                continue
+
+            is_low = kind <= VERY_LOW
+            start = i
+            i += 1
+            while i < n and kinds[i] != NONE and (kinds[i] <= VERY_LOW) == is_low:
+                if kinds[i] == VERY_LOW or kinds[i] == VERY_HIGH:
+                    kind = kinds[i]
+                i += 1
+
+            types[count] = kind
+            start_idx[count] = start
+            end_idx[count] = i - 1
+            count += 1
+
+        return types[:count], start_idx[:count], end_idx[:count]
+else:
+    def _find_episodes(vals, low, high):
+        """Pure-Python fallback for _find_episodes, looping over a list."""
+        types = []
+        start_idx = []
+        end_idx = []
+        is_low = None
+
+        for i, v in enumerate(vals.tolist()):
+            if v < 54:
+                kind = VERY_LOW
+            elif v < low:
+                kind = LOW
+            elif v > 250:
+                kind = VERY_HIGH
+            elif v > high:
+                kind = HIGH
+            else:
+                is_low = None
+                continue
+
+            if is_low is not None and (kind <= VERY_LOW) == is_low:
+                end_idx[-1] = i
+                if kind == VERY_LOW or kind == VERY_HIGH:
+                    types[-1] = kind
+            else:
+                is_low = kind <= VERY_LOW
+                types.append(kind)
+                start_idx.append(i)
+                end_idx.append(i)
+
+        return (
+            np.array(types, dtype=np.int8),
+            np.array(start_idx, dtype=np.int64),
+            np.array(end_idx, dtype=np.int64),
+        )
+
+# One row per episode from _episode_metrics. Rates are mg/dL per 5 min,
+# NaN when undefined; recovery_min and overcorrect_val are -1 when absent.
+EPISODE_DTYPE = np.dtype([
+    ("type", np.int8),
+    ("is_low", np.bool_),
+    ("start_idx", np.int64),
+    ("end_idx", np.int64),
+    ("extreme_idx", np.int64),
+    ("duration_min", np.int64),
+    ("rate_to", np.float64),
+    ("rate_from", np.float64),
+    ("recovery_min", np.int64),
+    ("recovery_rate", np.float64),
+    ("overcorrect_val", np.int64),
+])
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _minutes(micros):
+        return micros / 1e6 / 60
+
+
+    @njit(cache=True, nogil=True)
+    def _episode_metrics(vals, micros, low, high):
+        """Find episodes and measure how each one developed and resolved.
+
+        An episode starts at a reading below ``low`` or above ``high`` and runs
+        while readings stay on that side. For each one this records the
+        extreme reading, the rate towards and away from it, and how the
+        30 minutes (6 readings) after the episode went.
+
+        Args:
+            vals: int16 glucose values, oldest first.
+            micros: int64 microseconds for each value, from any fixed origin.
+
+        Returns:
+            EPISODE_DTYPE record array with one row per episode.
+        """
+        n = vals.shape[0]
+        out = np.empty(n, dtype=EPISODE_DTYPE)
+        count = 0
+
+        i = 0
+        while i < n:
+            v = vals[i]
+            if v < low:
+                kind = VERY_LOW if v < 54 else LOW
+                is_low = True
+            elif v > high:
+                kind = VERY_HIGH if v > 250 else HIGH
+                is_low = False
+            else:
+                i += 1
+                continue
+
+            start = i
+            while i < n:
+                v = vals[i]
+                if (is_low and not v < low) or (not is_low and not v > high):
+                    break
+                if v < 54:
+                    kind = VERY_LOW
+                elif v > 250:
+                    kind = VERY_HIGH
+                i += 1
+            end = i - 1
+
+            # Extreme point (nadir for lows, peak for highs), first occurrence
+            extreme = start
+            for j in range(start + 1, end + 1):
+                if (is_low and vals[j] < vals[extreme]) or (not is_low and vals[j] > vals[extreme]):
+                    extreme = j
+
+            rec = out[count]
+            rec["type"] = kind
+            rec["is_low"] = is_low
+            rec["start_idx"] = start
+            rec["end_idx"] = end
+            rec["extreme_idx"] = extreme
+            rec["duration_min"] = max(int(_minutes(micros[end] - micros[start])), 5)
+
+            # Rate TO extreme (how fast did you spike/drop?)
+            rec["rate_to"] = np.nan
+            if extreme > start:
+                t_diff = _minutes(micros[extreme] - micros[start])
+                if t_diff > 0:
+                    rec["rate_to"] = (float(vals[extreme]) - float(vals[start])) / t_diff * 5
+
+            # Rate FROM extreme (how fast did you recover within episode?)
+            rec["rate_from"] = np.nan
+            if extreme < end:
+                t_diff = _minutes(micros[end] - micros[extreme])
+                if t_diff > 0:
+                    rec["rate_from"] = (float(vals[end]) - float(vals[extreme])) / t_diff * 5
+
+            # Recovery after episode (30 min after)
+            rec["recovery_min"] = -1
+            rec["recovery_rate"] = np.nan
+            rec["overcorrect_val"] = -1
+            last = min(n, end + 7) - 1
+            if last > end:
+                # Time to get back in range
+                for j in range(end + 1, last + 1):
+                    if low <= vals[j] <= high:
+                        rec["recovery_min"] = int(_minutes(micros[j] - micros[end]))
+                        break
+
+                # Recovery rate after episode ended
+                t_diff = _minutes(micros[last] - micros[end])
+                if t_diff > 0:
+                    rec["recovery_rate"] = (float(vals[last]) - float(vals[end])) / t_diff * 5
+
+                # Overcorrection check
+                peak = vals[end + 1]
+                nadir = vals[end + 1]
+                for j in range(end + 2, last + 1):
+                    peak = max(peak, vals[j])
+                    nadir = min(nadir, vals[j])
+                if is_low and peak > high:
+                    rec["overcorrect_val"] = peak
+                elif not is_low and nadir < low:
+                    rec["overcorrect_val"] = nadir
+
+            count += 1
+
+        return out[:count]
+
+else:
+    def _minutes(micros):
+        return micros / 1e6 / 60
+
+    def _episode_metrics(vals, micros, low, high):
+        """Pure-Python fallback for _episode_metrics, looping over lists."""
+        vals = vals.tolist()
+        micros = micros.tolist()
+        n = len(vals)
+        rows = []
+
+        i = 0
+        while i < n:
+            v = vals[i]
+            if v < low:
+                kind = VERY_LOW if v < 54 else LOW
+                is_low = True
+            elif v > high:
+                kind = VERY_HIGH if v > 250 else HIGH
+                is_low = False
+            else:
+                i += 1
+                continue
+
+            start = i
+            while i < n:
+                v = vals[i]
+                if (is_low and not v < low) or (not is_low and not v > high):
+                    break
+                if v < 54:
+                    kind = VERY_LOW
+                elif v > 250:
+                    kind = VERY_HIGH
+                i += 1
+            end = i - 1
+
+            # Extreme point (nadir for lows, peak for highs), first occurrence
+            ep_vals = vals[start:end + 1]
+            extreme = start + ep_vals.index(min(ep_vals) if is_low else max(ep_vals))
+            duration = max(int(_minutes(micros[end] - micros[start])), 5)
+
+            # Rate TO extreme (how fast did you spike/drop?)
+            rate_to = np.nan
+            if extreme > start:
+                t_diff = _minutes(micros[extreme] - micros[start])
+                if t_diff > 0:
+                    rate_to = (vals[extreme] - vals[start]) / t_diff * 5
+
+            # Rate FROM extreme (how fast did you recover within episode?)
+            rate_from = np.nan
+            if extreme < end:
+                t_diff = _minutes(micros[end] - micros[extreme])
+                if t_diff > 0:
+                    rate_from = (vals[end] - vals[extreme]) / t_diff * 5
+
+            # Recovery after episode (30 min after)
+            recovery_min = -1
+            recovery_rate = np.nan
+            overcorrect_val = -1
+            last = min(n, end + 7) - 1
+            if last > end:
+                # Time to get back in range
+                for j in range(end + 1, last + 1):
+                    if low <= vals[j] <= high:
+                        recovery_min = int(_minutes(micros[j] - micros[end]))
+                        break
+
+                # Recovery rate after episode ended
+                t_diff = _minutes(micros[last] - micros[end])
+                if t_diff > 0:
+                    recovery_rate = (vals[last] - vals[end]) / t_diff * 5
+
+                # Overcorrection check
+                recovery = vals[end + 1:last + 1]
+                if is_low and max(recovery) > high:
+                    overcorrect_val = max(recovery)
+                elif not is_low and min(recovery) < low:
+                    overcorrect_val = min(recovery)
+
+            rows.append((
+                kind, is_low, start, end, extreme, duration, rate_to,
+                rate_from, recovery_min, recovery_rate, overcorrect_val,
+            ))
+
+        return np.array(rows, dtype=EPISODE_DTYPE)
@@ -1,15 +1,39 @@
+import csv
+import io
+import math
 import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import numpy as np
 from pydexcom import Dexcom
 from mcp.server.fastmcp import FastMCP
-from statistics import mean, stdev
+
+from mcp_server_dexcom._jit import (
+    EPISODE_TYPES,
+    LOW,
+    VERY_LOW,
+    _episode_metrics,
+    _find_episodes,
+    _range_counts,
+)
 
 mcp = FastMCP(
     "Dexcom Glucose",
     instructions="Access and analyze Dexcom CGM glucose data.",
 )
 
+_client_cache: dict[tuple[str, str], Dexcom] = {}
+_client_lock = threading.Lock()
+
 def get_dexcom_client() -> Dexcom:
-    """Create Dexcom client from environment variables."""
+    """Get a Dexcom client from environment variables.
+    
+    Clients are cached per (username, region) so the Share session is
+    logged in once and reused across tool calls; pydexcom renews
+    expired session IDs itself.
+    """
     username = os.getenv("DEXCOM_USERNAME")
     password = os.getenv("DEXCOM_PASSWORD")
     region = os.getenv("DEXCOM_REGION", "us")
@@ -19,33 +43,52 @@ def get_dexcom_client() -> Dexcom:
             "DEXCOM_USERNAME and DEXCOM_PASSWORD environment variables required"
         )
     
-    if region == "ous":
-        return Dexcom(username=username, password=password, region="ous")
-    elif region == "jp":
-        return Dexcom(username=username, password=password, region="jp")
-    else:
-        return Dexcom(username=username, password=password)
+    key = (username, region)
+    with _client_lock:
+        client = _client_cache.get(key)
+        if client is None:
+            # Only successful logins are cached, so a failed login is retried next call
+            if region == "ous":
+                client = Dexcom(username=username, password=password, region="ous")
+            elif region == "jp":
+                client = Dexcom(username=username, password=password, region="jp")
+            else:
+                client = Dexcom(username=username, password=password)
+            _client_cache[key] = client
+        return client
 
-def parse_external_data(data: list[dict]) -> list:
-    """Convert external data format to internal reading objects."""
-    from datetime import datetime
+class _ExternalReading:
+    """Reading parsed from external data, mirroring the pydexcom fields we use."""
+    __slots__ = ("value", "datetime")
     
-    class ExternalReading:
-        def __init__(self, glucose: int, timestamp: str):
-            self.value = glucose
-            self.datetime = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    def __init__(self, value: int, dt: datetime):
+        self.value = value
+        self.datetime = dt
+
+def parse_external_data(data: list[dict]) -> list:
+    """Convert external data format to internal reading objects.
     
-    return [ExternalReading(d["glucose_mg_dl"], d["timestamp"]) for d in data]
+    Raises:
+        ValueError: If a glucose_mg_dl value is not a whole number. Analysis
+            runs on integer arrays, so fractional values would be truncated.
+    """
+    # fromisoformat accepts a trailing 'Z' natively on Python 3.11+
+    parse = datetime.fromisoformat
+    readings = []
+    for d in data:
+        value = d["glucose_mg_dl"]
+        if type(value) is not int and not float(value).is_integer():
+            raise ValueError(f"glucose_mg_dl must be a whole number, got {value!r}")
+        readings.append(_ExternalReading(value, parse(d["timestamp"])))
+    return readings
 
 
-def _ensure_utc(dt) -> 'datetime':
+def _ensure_utc(dt) -> datetime:
     """Ensure a datetime is timezone-aware UTC.
     
     pydexcom may return naive datetimes (assumed UTC).
     This normalizes to timezone-aware UTC for safe comparisons.
     """
-    from datetime import datetime, timezone
-    
     if dt.tzinfo is None:
         # Naive datetime - assume UTC
         return dt.replace(tzinfo=timezone.utc)
@@ -53,6 +96,71 @@ def _ensure_utc(dt) -> 'datetime':
         # Already aware - convert to UTC
         return dt.astimezone(timezone.utc)
 
+def _reading_rows(readings: list):
+    """Yield (timestamp, mg/dL, mmol/L, trend, trend_arrow) for each reading.
+    
+    A batch comes from a single source, so check once whether these are
+    Dexcom readings (with mmol/L and trend) rather than probing every
+    reading with getattr.
+    """
+    if readings and hasattr(readings[0], 'mmol_l'):
+        return (
+            (r.datetime.isoformat(), r.value, r.mmol_l, r.trend_direction, r.trend_arrow)
+            for r in readings
+        )
+    return (
+        (r.datetime.isoformat(), r.value, round(r.value / 18.0, 1), None, None)
+        for r in readings
+    )
+
+def _values_array(readings: list) -> np.ndarray:
+    """Collect glucose values into a contiguous int16 array for vectorized stats."""
+    return np.fromiter((r.value for r in readings), dtype=np.int16, count=len(readings))
+
+def _hours_array(readings: list) -> np.ndarray:
+    """Hour of day of each reading, in its own timezone, as an int8 array."""
+    return np.fromiter((r.datetime.hour for r in readings), dtype=np.int8, count=len(readings))
+
+class _Readings(NamedTuple):
+    """Struct-of-arrays view of a batch of readings, oldest first."""
+    values: np.ndarray   # int16 glucose in mg/dL
+    micros: np.ndarray   # int64 microseconds since the first input reading
+    datetimes: list      # original datetimes, for formatting output
+
+def _to_arrays(readings: list) -> _Readings:
+    """Adapt readings into chronologically sorted arrays for _episode_metrics.
+    
+    Converting every timestamp is the expensive part, so tools that don't
+    need time differences use _values_array/_hours_array instead.
+    """
+    values = _values_array(readings)
+    datetimes = [r.datetime for r in readings]
+    
+    # The kernels only use time differences, so measure from the first
+    # reading; summing the timedelta's parts is cheaper than td // 1us
+    first = datetimes[0]
+    micros = np.fromiter(
+        (
+            (td.days * 86400 + td.seconds) * 1_000_000 + td.microseconds
+            for td in [dt - first for dt in datetimes]
+        ),
+        dtype=np.int64,
+        count=len(datetimes),
+    )
+    
+    # Dexcom returns newest first and external data is usually in order,
+    # so only fall back to a full sort when neither holds
+    steps = np.diff(micros)
+    if (steps >= 0).all():
+        return _Readings(values, micros, datetimes)
+    if (steps < 0).all():
+        return _Readings(values[::-1].copy(), micros[::-1].copy(), datetimes[::-1])
+    
+    order = np.argsort(micros, kind="stable")
+    return _Readings(values[order], micros[order], [datetimes[i] for i in order.tolist()])
+
+_AGP_PERCENTILES = np.array([5, 25, 50, 75, 95])
+
 @mcp.tool()
 def get_current_glucose() -> dict:
     """
@@ -105,8 +213,6 @@ def get_glucose_readings(
     Note: When using start_minutes/end_minutes, we fetch from start_minutes back
     and filter to the window. start_minutes should be > end_minutes (further back in time).
     """
-    from datetime import datetime, timedelta, timezone
-    
     if data:
         readings = parse_external_data(data)
         readings = sorted(readings, key=lambda r: r.datetime, reverse=True)
@@ -147,13 +253,13 @@ def get_glucose_readings(
         "count": len(readings),
         "readings": [
             {
-                "glucose_mg_dl": r.value,
-                "glucose_mmol_l": getattr(r, 'mmol_l', round(r.value / 18.0, 1)),
-                "trend": getattr(r, 'trend_direction', None),
-                "trend_arrow": getattr(r, 'trend_arrow', None),
-                "timestamp": r.datetime.isoformat(),
+                "glucose_mg_dl": mg_dl,
+                "glucose_mmol_l": mmol_l,
+                "trend": trend,
+                "trend_arrow": trend_arrow,
+                "timestamp": ts,
             }
-            for r in readings
+            for ts, mg_dl, mmol_l, trend, trend_arrow in _reading_rows(readings)
         ]
     }
 
@@ -181,8 +287,6 @@ def get_statistics(
         get_statistics(minutes=180)  # Stats for last 3 hours
         get_statistics(start_minutes=240, end_minutes=180)  # Stats for 4h to 3h ago
     """
-    from datetime import datetime, timedelta, timezone
-    
     if data:
         readings = parse_external_data(data)
     else:
@@ -204,18 +308,14 @@ def get_statistics(
             "message": "No readings found"
         }
     
-    values = [r.value for r in readings]
+    arr = _values_array(readings)
     
-    avg = mean(values)
-    sd = stdev(values) if len(values) > 1 else 0.0
+    avg = float(arr.mean())
+    sd = float(arr.std(ddof=1)) if arr.size > 1 else 0.0
     cv = (sd / avg * 100) if avg > 0 else 0.0
     
-    total = len(values)
-    in_range = sum(1 for v in values if low <= v <= high)
-    below = sum(1 for v in values if v < low)
-    above = sum(1 for v in values if v > high)
-    very_low = sum(1 for v in values if v < 54)
-    very_high = sum(1 for v in values if v > 250)
+    total = arr.size
+    very_low, below, in_range, above, very_high = _range_counts(arr, low, high)
     
     return {
         "reading_count": total,
@@ -223,8 +323,8 @@ def get_statistics(
         "mean_mmol_l": round(avg / 18.0, 1),
         "std_dev": round(sd, 1),
         "cv_percent": round(cv, 1),
-        "min_mg_dl": min(values),
-        "max_mg_dl": max(values),
+        "min_mg_dl": int(arr.min()),
+        "max_mg_dl": int(arr.max()),
         "time_in_range_percent": round(in_range / total * 100, 1),
         "time_below_percent": round(below / total * 100, 1),
         "time_above_percent": round(above / total * 100, 1),
@@ -255,19 +355,32 @@ def get_status_summary(minutes: int = 180) -> dict:
     
     client = get_dexcom_client()
     
-    # Current reading
-    current = client.get_current_glucose_reading()
+    # One fetch, newest first, covering both the current reading (last 10
+    # minutes) and the requested period
+    fetch_minutes = max(minutes, 10)
+    recent = client.get_glucose_readings(
+        minutes=fetch_minutes, max_count=min(288, fetch_minutes // 5 + 1)
+    )
     
-    # Historical readings for context
-    max_count = min(288, minutes // 5 + 1)
-    readings = client.get_glucose_readings(minutes=minutes, max_count=max_count)
-    
-    if current is None and not readings:
+    if not recent:
         return {
             "status": "no_data",
             "message": "No glucose data available"
         }
     
+    # Current reading is the newest one, if within the last 10 minutes
+    now = datetime.now(timezone.utc)
+    current = None
+    if (now - _ensure_utc(recent[0].datetime)).total_seconds() < 600:
+        current = recent[0]
+    
+    # Historical readings for context, trimmed to the requested period
+    readings = recent
+    if minutes < fetch_minutes:
+        cutoff = now - timedelta(minutes=minutes)
+        readings = [r for r in recent if _ensure_utc(r.datetime) >= cutoff]
+        readings = readings[:min(288, minutes // 5 + 1)]
+    
     result = {"period_minutes": minutes}
     
     # Current state
@@ -283,37 +396,30 @@ def get_status_summary(minutes: int = 180) -> dict:
     
     # Period stats
     if readings:
-        values = [r.value for r in readings]
-        avg = sum(values) / len(values)
+        arr = _values_array(readings)
+        avg = float(arr.mean())
         
-        in_range = sum(1 for v in values if 70 <= v <= 180)
-        below = sum(1 for v in values if v < 70)
-        above = sum(1 for v in values if v > 180)
-        very_low = sum(1 for v in values if v < 54)
-        very_high = sum(1 for v in values if v > 250)
+        very_low, below, in_range, above, very_high = _range_counts(arr, 70, 180)
         
         result["period_stats"] = {
             "average_mg_dl": round(avg, 1),
             "average_mmol_l": round(avg / 18.0, 1),
-            "min_mg_dl": min(values),
-            "max_mg_dl": max(values),
-            "readings_count": len(values),
-            "time_in_range_percent": round(in_range / len(values) * 100, 1),
-            "time_below_percent": round(below / len(values) * 100, 1),
-            "time_above_percent": round(above / len(values) * 100, 1),
+            "min_mg_dl": int(arr.min()),
+            "max_mg_dl": int(arr.max()),
+            "readings_count": arr.size,
+            "time_in_range_percent": round(in_range / arr.size * 100, 1),
+            "time_below_percent": round(below / arr.size * 100, 1),
+            "time_above_percent": round(above / arr.size * 100, 1),
         }
         
-        # Alerts
-        recent_lows = [r for r in readings if r.value < 70]
-        recent_highs = [r for r in readings if r.value > 180]
-        
+        # Alerts, reusing the period's range counts
         result["alerts"] = {
-            "has_recent_lows": len(recent_lows) > 0,
-            "has_recent_highs": len(recent_highs) > 0,
+            "has_recent_lows": below > 0,
+            "has_recent_highs": above > 0,
             "has_urgent_low": very_low > 0,
             "has_urgent_high": very_high > 0,
-            "low_count": len(recent_lows),
-            "high_count": len(recent_highs),
+            "low_count": below,
+            "high_count": above,
         }
     
     # Plain English summary
@@ -378,8 +484,6 @@ def detect_episodes(
         detect_episodes(minutes=180)  # Episodes in last 3 hours
         detect_episodes(start_minutes=240, end_minutes=180)  # Episodes 4h to 3h ago
     """
-    from datetime import datetime, timedelta, timezone
-    
     if data:
         readings = parse_external_data(data)
     else:
@@ -398,66 +502,30 @@ def detect_episodes(
     if not readings:
         return {"status": "no_data", "message": "No readings available"}
     
+    # Only the order is needed here, not timestamps as numbers, and Timsort
+    # handles Dexcom's newest-first lists in one linear pass
     sorted_readings = sorted(readings, key=lambda r: r.datetime)
+    values = _values_array(sorted_readings)
     
-    episodes = []
-    current_episode = None
-    
-    for reading in sorted_readings:
-        value = reading.value
-        
-        if value < 54:
-            episode_type = "very_low"
-        elif value < low:
-            episode_type = "low"
-        elif value > 250:
-            episode_type = "very_high"
-        elif value > high:
-            episode_type = "high"
-        else:
-            episode_type = None
-        
-        if episode_type:
-            is_low = episode_type in ("low", "very_low")
-            current_is_low = current_episode and current_episode["type"] in ("low", "very_low")
-            
-            if current_episode and is_low == current_is_low:
-                current_episode["end"] = reading.datetime
-                current_episode["values"].append(value)
-                if episode_type in ("very_low", "very_high"):
-                    current_episode["type"] = episode_type
-            else:
-                if current_episode:
-                    episodes.append(current_episode)
-                current_episode = {
-                    "type": episode_type,
-                    "start": reading.datetime,
-                    "end": reading.datetime,
-                    "values": [value],
-                }
-        else:
-            if current_episode:
-                episodes.append(current_episode)
-                current_episode = None
-    
-    if current_episode:
-        current_episode["ongoing"] = True
-        episodes.append(current_episode)
+    types, starts, ends = _find_episodes(values, low, high)
     
+    # Episodes are short, so their stats are cheaper on list slices
+    values = values.tolist()
     formatted = []
-    for ep in episodes:
-        duration = int((ep["end"] - ep["start"]).total_seconds() / 60)
-        values = ep["values"]
-        extreme = min(values) if ep["type"] in ("low", "very_low") else max(values)
+    for ep_type, start_idx, end_idx in zip(types.tolist(), starts.tolist(), ends.tolist()):
+        start = sorted_readings[start_idx].datetime
+        end = sorted_readings[end_idx].datetime
+        duration = int((end - start).total_seconds() / 60)
+        ep_values = values[start_idx:end_idx + 1]
         
         formatted.append({
-            "type": ep["type"],
-            "start": ep["start"].isoformat(),
-            "end": ep["end"].isoformat(),
+            "type": EPISODE_TYPES[ep_type],
+            "start": start.isoformat(),
+            "end": end.isoformat(),
             "duration_minutes": max(duration, 5),
-            "extreme_value": extreme,
-            "mean_value": round(sum(values) / len(values), 1),
-            "ongoing": ep.get("ongoing", False),
+            "extreme_value": min(ep_values) if ep_type in (LOW, VERY_LOW) else max(ep_values),
+            "mean_value": round(sum(ep_values) / len(ep_values), 1),
+            "ongoing": end_idx == len(values) - 1,
         })
     
     low_eps = [e for e in formatted if e["type"] in ("low", "very_low")]
@@ -504,129 +572,39 @@ def get_episode_details(
     if not readings:
         return {"status": "no_data", "message": "No readings available"}
     
-    points = sorted([(r.value, r.datetime) for r in readings], key=lambda x: x[1])
-    
-    # Find episodes
-    episodes = []
-    i = 0
-    while i < len(points):
-        value, dt = points[i]
-        
-        if value < low:
-            ep_type = "very_low" if value < 54 else "low"
-            is_low_episode = True
-        elif value > high:
-            ep_type = "very_high" if value > 250 else "high"
-            is_low_episode = False
-        else:
-            i += 1
-            continue
-        
-        start_idx = i
-        episode_values = []
-        while i < len(points):
-            v = points[i][0]
-            in_low = v < low
-            in_high = v > high
-            
-            if (is_low_episode and not in_low) or (not is_low_episode and not in_high):
-                break
-            
-            episode_values.append(points[i])
-            if v < 54:
-                ep_type = "very_low"
-            elif v > 250:
-                ep_type = "very_high"
-            i += 1
-        
-        episodes.append({
-            "type": ep_type,
-            "start_idx": start_idx,
-            "end_idx": i - 1,
-            "values": episode_values,
-            "is_low": is_low_episode,
-        })
+    arrays = _to_arrays(readings)
+    values, datetimes = arrays.values, arrays.datetimes
     
     # Analyze each episode
     detailed = []
-    for ep in episodes:
-        values = ep["values"]
-        start_idx, end_idx = ep["start_idx"], ep["end_idx"]
-        start_time, end_time = values[0][1], values[-1][1]
-        glucose_values = [v for v, _ in values]
-        
-        # Find extreme point (nadir for lows, peak for highs)
-        if ep["is_low"]:
-            extreme = min(glucose_values)
-            extreme_idx = glucose_values.index(extreme)
-        else:
-            extreme = max(glucose_values)
-            extreme_idx = glucose_values.index(extreme)
-        
-        extreme_time = values[extreme_idx][1]
-        duration = max(int((end_time - start_time).total_seconds() / 60), 5)
-        
-        # Lead-up (30 min before episode)
-        leadup = points[max(0, start_idx - 6):start_idx]
+    for ep in _episode_metrics(values, arrays.micros, low, high).tolist():
+        (ep_type, is_low, start_idx, end_idx, extreme_idx, duration,
+         rate_to, rate_from, recovery_min, recovery_rate, overcorrect_val) = ep
         
-        # Rate TO extreme (how fast did you spike/drop?)
-        rate_to_extreme = None
-        if extreme_idx > 0:
-            t_diff = (extreme_time - start_time).total_seconds() / 60
-            if t_diff > 0:
-                v_diff = extreme - values[0][0]
-                rate_to_extreme = round(v_diff / t_diff * 5, 1)  # per 5 min
-        
-        # Rate FROM extreme (how fast did you recover within episode?)
-        rate_from_extreme = None
-        if extreme_idx < len(values) - 1:
-            t_diff = (end_time - extreme_time).total_seconds() / 60
-            if t_diff > 0:
-                v_diff = values[-1][0] - extreme
-                rate_from_extreme = round(v_diff / t_diff * 5, 1)  # per 5 min
-        
-        # Recovery after episode (30 min after)
-        recovery = points[end_idx + 1:min(len(points), end_idx + 7)]
-        recovery_minutes = None
-        recovery_rate = None
         overcorrection = None
-        
-        if recovery:
-            # Time to get back in range
-            for v, dt in recovery:
-                if low <= v <= high:
-                    recovery_minutes = int((dt - end_time).total_seconds() / 60)
-                    break
-            
-            # Recovery rate after episode ended
-            t_diff = (recovery[-1][1] - end_time).total_seconds() / 60
-            if t_diff > 0:
-                recovery_rate = round((recovery[-1][0] - values[-1][0]) / t_diff * 5, 1)
-            
-            # Overcorrection check
-            recovery_values = [v for v, _ in recovery]
-            if ep["is_low"] and max(recovery_values) > high:
-                overcorrection = {"type": "rebound_high", "value": max(recovery_values)}
-            elif not ep["is_low"] and min(recovery_values) < low:
-                overcorrection = {"type": "overcorrect_low", "value": min(recovery_values)}
+        if overcorrect_val >= 0:
+            overcorrection = {
+                "type": "rebound_high" if is_low else "overcorrect_low",
+                "value": overcorrect_val,
+            }
         
         detailed.append({
-            "type": ep["type"],
-            "start": start_time.isoformat(),
-            "end": end_time.isoformat(),
+            "type": EPISODE_TYPES[ep_type],
+            "start": datetimes[start_idx].isoformat(),
+            "end": datetimes[end_idx].isoformat(),
             "duration_minutes": duration,
-            "extreme_value": extreme,
-            "extreme_time": extreme_time.isoformat(),
-            "rate_to_extreme_per_5min": rate_to_extreme,
-            "rate_from_extreme_per_5min": rate_from_extreme,
-            "recovery_minutes": recovery_minutes,
-            "recovery_rate_per_5min": recovery_rate,
+            "extreme_value": int(values[extreme_idx]),
+            "extreme_time": datetimes[extreme_idx].isoformat(),
+            "rate_to_extreme_per_5min": None if math.isnan(rate_to) else round(rate_to, 1),
+            "rate_from_extreme_per_5min": None if math.isnan(rate_from) else round(rate_from, 1),
+            "recovery_minutes": None if recovery_min < 0 else recovery_min,
+            "recovery_rate_per_5min": None if math.isnan(recovery_rate) else round(recovery_rate, 1),
             "overcorrection": overcorrection,
-            "leadup_values": [v for v, _ in leadup],
+            "leadup_values": values[max(0, start_idx - 6):start_idx].tolist(),
         })
     
     return {
-        "readings_analyzed": len(points),
+        "readings_analyzed": values.size,
         "episodes_analyzed": len(detailed),
         "episodes": detailed,
     }
@@ -660,27 +638,29 @@ def analyze_time_blocks(
     if not readings:
         return {"status": "no_data", "message": "No readings available"}
     
-    # Define time blocks
+    # Define time blocks, in order of block id (hour // 6)
     blocks = {
-        "overnight": {"range": "00:00-06:00", "readings": []},
-        "morning": {"range": "06:00-12:00", "readings": []},
-        "afternoon": {"range": "12:00-18:00", "readings": []},
-        "evening": {"range": "18:00-24:00", "readings": []},
+        "overnight": "00:00-06:00",
+        "morning": "06:00-12:00",
+        "afternoon": "12:00-18:00",
+        "evening": "18:00-24:00",
     }
     
-    # Sort readings into blocks
-    for r in readings:
-        hour = r.datetime.hour
-        value = r.value
-        
-        if 0 <= hour < 6:
-            blocks["overnight"]["readings"].append(value)
-        elif 6 <= hour < 12:
-            blocks["morning"]["readings"].append(value)
-        elif 12 <= hour < 18:
-            blocks["afternoon"]["readings"].append(value)
-        else:
-            blocks["evening"]["readings"].append(value)
+    # Per-block aggregates, one bincount per statistic over all readings
+    vals = _values_array(readings)
+    block_id = _hours_array(readings) // 6
+    counts = np.bincount(block_id, minlength=4).tolist()
+    sums = np.bincount(block_id, weights=vals, minlength=4).tolist()
+    in_range_counts = np.bincount(block_id[(vals >= low) & (vals <= high)], minlength=4).tolist()
+    below_counts = np.bincount(block_id[vals < low], minlength=4).tolist()
+    above_counts = np.bincount(block_id[vals > high], minlength=4).tolist()
+    
+    # Seeded with the overall max/min, so every non-empty block gets its own
+    mins = np.full(4, vals.max())
+    np.minimum.at(mins, block_id, vals)
+    maxs = np.full(4, vals.min())
+    np.maximum.at(maxs, block_id, vals)
+    mins, maxs = mins.tolist(), maxs.tolist()
     
     # Analyze each block
     analyzed = {}
@@ -689,22 +669,21 @@ def analyze_time_blocks(
     best_tir = -1
     worst_tir = 101
     
-    for name, block in blocks.items():
-        values = block["readings"]
+    for i, (name, time_range) in enumerate(blocks.items()):
+        count = counts[i]
         
-        if not values:
+        if not count:
             analyzed[name] = {
-                "time_range": block["range"],
+                "time_range": time_range,
                 "status": "no_data",
                 "readings_count": 0,
             }
             continue
         
-        avg = sum(values) / len(values)
-        in_range = sum(1 for v in values if low <= v <= high)
-        below = sum(1 for v in values if v < low)
-        above = sum(1 for v in values if v > high)
-        tir = round(in_range / len(values) * 100, 1)
+        avg = sums[i] / count
+        below = below_counts[i]
+        above = above_counts[i]
+        tir = round(in_range_counts[i] / count * 100, 1)
         
         # Track best/worst
         if tir > best_tir:
@@ -725,14 +704,14 @@ def analyze_time_blocks(
             assessment = "problematic"
         
         analyzed[name] = {
-            "time_range": block["range"],
-            "readings_count": len(values),
+            "time_range": time_range,
+            "readings_count": count,
             "average_mg_dl": round(avg, 1),
-            "min_mg_dl": min(values),
-            "max_mg_dl": max(values),
+            "min_mg_dl": mins[i],
+            "max_mg_dl": maxs[i],
             "time_in_range_percent": tir,
-            "time_below_percent": round(below / len(values) * 100, 1),
-            "time_above_percent": round(above / len(values) * 100, 1),
+            "time_below_percent": round(below / count * 100, 1),
+            "time_above_percent": round(above / count * 100, 1),
             "assessment": assessment,
         }
     
@@ -744,6 +723,9 @@ def analyze_time_blocks(
         "insight": f"Best control during {best_block} ({best_tir}% TIR), worst during {worst_block} ({worst_tir}% TIR)" if best_block and worst_block else None,
     }
     
+_FALLING_TRENDS = frozenset(("SingleDown", "DoubleDown"))
+_RISING_TRENDS = frozenset(("SingleUp", "DoubleUp"))
+
 @mcp.tool()
 def check_alerts(
     urgent_low: int = 54,
@@ -787,9 +769,9 @@ def check_alerts(
         alerts.append({"level": "warning", "type": "high", "message": f"High: {value} mg/dL"})
     
     # Trend alerts
-    if trend in ("SingleDown", "DoubleDown") and value < 100:
+    if trend in _FALLING_TRENDS and value < 100:
         alerts.append({"level": "warning", "type": "falling_fast", "message": f"Falling fast at {value} mg/dL"})
-    elif trend in ("SingleUp", "DoubleUp") and value > 150:
+    elif trend in _RISING_TRENDS and value > 150:
         alerts.append({"level": "warning", "type": "rising_fast", "message": f"Rising fast at {value} mg/dL"})
     
     return {
@@ -828,8 +810,6 @@ def export_data(
         export_data(minutes=180)  # Export last 3 hours
         export_data(start_minutes=240, end_minutes=180)  # Export 4h to 3h ago
     """
-    from datetime import timedelta, timezone
-    
     if data:
         readings = parse_external_data(data)
     else:
@@ -848,36 +828,35 @@ def export_data(
     if not readings:
         return {"status": "no_data", "message": "No readings to export"}
     
-    # Consistent schema for persistence
-    records = [
-        {
-            "glucose_mg_dl": r.value,
-            "glucose_mmol_l": getattr(r, 'mmol_l', round(r.value / 18.0, 1)),
-            "trend": getattr(r, 'trend_direction', None),
-            "trend_arrow": getattr(r, 'trend_arrow', None),
-            "timestamp": r.datetime.isoformat(),
-        }
-        for r in readings
-    ]
-    
-    from datetime import datetime
-    
     result = {
         "export_timestamp": datetime.now().isoformat(),
-        "readings_count": len(records),
+        "readings_count": len(readings),
         "period_minutes": minutes if not data else None,
-        "oldest_reading": records[-1]["timestamp"] if records else None,
-        "newest_reading": records[0]["timestamp"] if records else None,
+        "oldest_reading": readings[-1].datetime.isoformat(),
+        "newest_reading": readings[0].datetime.isoformat(),
         "format": format,
-        "readings": records,
     }
     
-    if format == "csv":
+    if format != "csv":
+        # Consistent schema for persistence
+        result["readings"] = [
+            {
+                "glucose_mg_dl": mg_dl,
+                "glucose_mmol_l": mmol_l,
+                "trend": trend,
+                "trend_arrow": trend_arrow,
+                "timestamp": ts,
+            }
+            for ts, mg_dl, mmol_l, trend, trend_arrow in _reading_rows(readings)
+        ]
+    else:
+        # Stream rows straight from the readings, without building records
         headers = ["timestamp", "glucose_mg_dl", "glucose_mmol_l", "trend", "trend_arrow"]
-        csv_rows = [",".join(headers)]
-        for r in records:
-            csv_rows.append(f"{r['timestamp']},{r['glucose_mg_dl']},{r['glucose_mmol_l']},{r['trend']},{r['trend_arrow']}")
-        result["csv"] = "\n".join(csv_rows)
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(headers)
+        writer.writerows(_reading_rows(readings))
+        result["csv"] = buf.getvalue()
     
     return result
 
@@ -906,32 +885,34 @@ def get_agp_report(
     if not readings:
         return {"status": "no_data", "message": "No readings available"}
     
-    # Group readings by hour
-    hourly_values = {h: [] for h in range(24)}
-    for r in readings:
-        hourly_values[r.datetime.hour].append(r.value)
+    hours = _hours_array(readings)
+    all_values = _values_array(readings)
+    
+    # One sort by (hour, value) leaves each hour's bucket contiguous and sorted
+    order = np.lexsort((all_values, hours))
+    by_hour = all_values[order]
+    bounds = np.searchsorted(hours[order], np.arange(25))
+    counts = np.diff(bounds)
     
-    def percentile(values: list, p: int) -> int | None:
-        if not values:
-            return None
-        sorted_vals = sorted(values)
-        idx = int(len(sorted_vals) * p / 100)
-        idx = min(idx, len(sorted_vals) - 1)
-        return sorted_vals[idx]
+    # Nearest-rank percentiles for all 24 hours in one gather; rows for
+    # empty hours hold junk and are skipped below
+    ranks = np.minimum(counts[:, None] * _AGP_PERCENTILES // 100, counts[:, None] - 1)
+    percentiles = by_hour[bounds[:-1, None] + ranks].tolist()
+    counts = counts.tolist()
     
     # Build hourly profile with percentiles
     hourly_profile = []
     for hour in range(24):
-        values = hourly_values[hour]
-        if values:
+        if counts[hour]:
+            p5, p25, p50, p75, p95 = percentiles[hour]
             hourly_profile.append({
                 "hour": hour,
-                "p5": percentile(values, 5),
-                "p25": percentile(values, 25),
-                "p50": percentile(values, 50),
-                "p75": percentile(values, 75),
-                "p95": percentile(values, 95),
-                "readings_count": len(values),
+                "p5": p5,
+                "p25": p25,
+                "p50": p50,
+                "p75": p75,
+                "p95": p95,
+                "readings_count": counts[hour],
             })
         else:
             hourly_profile.append({
@@ -941,18 +922,13 @@ def get_agp_report(
             })
     
     # Overall stats
-    all_values = [r.value for r in readings]
-    avg = sum(all_values) / len(all_values)
-    sd = stdev(all_values) if len(all_values) > 1 else 0
+    avg = float(all_values.mean())
+    sd = float(all_values.std(ddof=1)) if all_values.size > 1 else 0
     cv = (sd / avg * 100) if avg > 0 else 0
     gmi = 3.31 + 0.02392 * avg
     
-    in_range = sum(1 for v in all_values if 70 <= v <= 180)
-    below_70 = sum(1 for v in all_values if v < 70)
-    below_54 = sum(1 for v in all_values if v < 54)
-    above_180 = sum(1 for v in all_values if v > 180)
-    above_250 = sum(1 for v in all_values if v > 250)
-    total = len(all_values)
+    below_54, below_70, in_range, above_180, above_250 = _range_counts(all_values, 70, 180)
+    total = all_values.size
     
     return {
         "report_type": "ambulatory_glucose_profile",
@@ -0,0 +1,273 @@
+"""Episode tools against the original list-based implementation.
+
+Every test runs twice: with the Numba kernels and with numba hidden from
+the import system, so the pure-Python fallbacks in _jit are exercised too.
+"""
+import importlib
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mcp_server_dexcom import _jit, server as _server
+
+
+@pytest.fixture(params=["numba", "fallback"])
+def server(request, monkeypatch):
+    if request.param == "numba":
+        pytest.importorskip("numba")
+        yield _server
+        return
+
+    with monkeypatch.context() as m:
+        m.setitem(sys.modules, "numba", None)
+        importlib.reload(_jit)
+        fallback = importlib.reload(_server)
+    assert not _jit.HAVE_NUMBA
+    yield fallback
+
+    importlib.reload(_jit)
+    importlib.reload(_server)
+
+
+def make_data(seed, n=288, order="newest_first"):
+    """Random-walk readings every 5 minutes, with occasional gaps and repeats."""
+    rnd = random.Random(seed)
+    tz = timezone(timedelta(hours=rnd.choice([-5, 0, 9])))
+    dt = datetime(2026, 3, 1, tzinfo=tz)
+    value = rnd.randint(60, 250)
+    data = []
+    for _ in range(n):
+        value = max(40, min(400, value + rnd.randint(-30, 30)))
+        data.append({"glucose_mg_dl": value, "timestamp": dt.isoformat()})
+        dt += timedelta(minutes=rnd.choice([5, 5, 5, 5, 10, 0]))
+
+    if order == "newest_first":
+        data.reverse()
+    elif order == "shuffled":
+        rnd.shuffle(data)
+    return data
+
+
+def _points(data):
+    return [(d["glucose_mg_dl"], datetime.fromisoformat(d["timestamp"])) for d in data]
+
+
+def reference_episode_details(data, low, high):
+    """get_episode_details as it was before the NumPy/Numba rewrite."""
+    points = sorted(_points(data), key=lambda x: x[1])
+
+    episodes = []
+    i = 0
+    while i < len(points):
+        value, dt = points[i]
+        if value < low:
+            ep_type = "very_low" if value < 54 else "low"
+            is_low_episode = True
+        elif value > high:
+            ep_type = "very_high" if value > 250 else "high"
+            is_low_episode = False
+        else:
+            i += 1
+            continue
+
+        start_idx = i
+        episode_values = []
+        while i < len(points):
+            v = points[i][0]
+            if (is_low_episode and not v < low) or (not is_low_episode and not v > high):
+                break
+            episode_values.append(points[i])
+            if v < 54:
+                ep_type = "very_low"
+            elif v > 250:
+                ep_type = "very_high"
+            i += 1
+
+        episodes.append({
+            "type": ep_type,
+            "start_idx": start_idx,
+            "end_idx": i - 1,
+            "values": episode_values,
+            "is_low": is_low_episode,
+        })
+
+    detailed = []
+    for ep in episodes:
+        values = ep["values"]
+        start_idx, end_idx = ep["start_idx"], ep["end_idx"]
+        start_time, end_time = values[0][1], values[-1][1]
+        glucose_values = [v for v, _ in values]
+
+        extreme = min(glucose_values) if ep["is_low"] else max(glucose_values)
+        extreme_idx = glucose_values.index(extreme)
+        extreme_time = values[extreme_idx][1]
+        duration = max(int((end_time - start_time).total_seconds() / 60), 5)
+        leadup = points[max(0, start_idx - 6):start_idx]
+
+        rate_to_extreme = None
+        if extreme_idx > 0:
+            t_diff = (extreme_time - start_time).total_seconds() / 60
+            if t_diff > 0:
+                rate_to_extreme = round((extreme - values[0][0]) / t_diff * 5, 1)
+
+        rate_from_extreme = None
+        if extreme_idx < len(values) - 1:
+            t_diff = (end_time - extreme_time).total_seconds() / 60
+            if t_diff > 0:
+                rate_from_extreme = round((values[-1][0] - extreme) / t_diff * 5, 1)
+
+        recovery = points[end_idx + 1:min(len(points), end_idx + 7)]
+        recovery_minutes = None
+        recovery_rate = None
+        overcorrection = None
+        if recovery:
+            for v, dt in recovery:
+                if low <= v <= high:
+                    recovery_minutes = int((dt - end_time).total_seconds() / 60)
+                    break
+
+            t_diff = (recovery[-1][1] - end_time).total_seconds() / 60
+            if t_diff > 0:
+                recovery_rate = round((recovery[-1][0] - values[-1][0]) / t_diff * 5, 1)
+
+            recovery_values = [v for v, _ in recovery]
+            if ep["is_low"] and max(recovery_values) > high:
+                overcorrection = {"type": "rebound_high", "value": max(recovery_values)}
+            elif not ep["is_low"] and min(recovery_values) < low:
+                overcorrection = {"type": "overcorrect_low", "value": min(recovery_values)}
+
+        detailed.append({
+            "type": ep["type"],
+            "start": start_time.isoformat(),
+            "end": end_time.isoformat(),
+            "duration_minutes": duration,
+            "extreme_value": extreme,
+            "extreme_time": extreme_time.isoformat(),
+            "rate_to_extreme_per_5min": rate_to_extreme,
+            "rate_from_extreme_per_5min": rate_from_extreme,
+            "recovery_minutes": recovery_minutes,
+            "recovery_rate_per_5min": recovery_rate,
+            "overcorrection": overcorrection,
+            "leadup_values": [v for v, _ in leadup],
+        })
+
+    return {
+        "readings_analyzed": len(points),
+        "episodes_analyzed": len(detailed),
+        "episodes": detailed,
+    }
+
+
+def reference_detect_episodes(data, low, high):
+    """Episode list from detect_episodes as it was before the rewrite."""
+    episodes = []
+    current = None
+    for value, dt in sorted(_points(data), key=lambda x: x[1]):
+        if value < 54:
+            episode_type = "very_low"
+        elif value < low:
+            episode_type = "low"
+        elif value > 250:
+            episode_type = "very_high"
+        elif value > high:
+            episode_type = "high"
+        else:
+            episode_type = None
+
+        if episode_type:
+            is_low = episode_type in ("low", "very_low")
+            current_is_low = current and current["type"] in ("low", "very_low")
+            if current and is_low == current_is_low:
+                current["end"] = dt
+                current["values"].append(value)
+                if episode_type in ("very_low", "very_high"):
+                    current["type"] = episode_type
+            else:
+                if current:
+                    episodes.append(current)
+                current = {"type": episode_type, "start": dt, "end": dt, "values": [value]}
+        elif current:
+            episodes.append(current)
+            current = None
+
+    if current:
+        current["ongoing"] = True
+        episodes.append(current)
+
+    formatted = []
+    for ep in episodes:
+        duration = int((ep["end"] - ep["start"]).total_seconds() / 60)
+        values = ep["values"]
+        formatted.append({
+            "type": ep["type"],
+            "start": ep["start"].isoformat(),
+            "end": ep["end"].isoformat(),
+            "duration_minutes": max(duration, 5),
+            "extreme_value": min(values) if ep["type"] in ("low", "very_low") else max(values),
+            "mean_value": round(sum(values) / len(values), 1),
+            "ongoing": ep.get("ongoing", False),
+        })
+    return formatted
+
+
+THRESHOLDS = [(70, 180), (54, 250), (100, 140), (150, 120)]
+
+
+@pytest.mark.parametrize("order", ["newest_first", "oldest_first", "shuffled"])
+@pytest.mark.parametrize("seed", range(6))
+def test_episode_details_match_reference(server, seed, order):
+    data = make_data(seed, order=order)
+    for low, high in THRESHOLDS:
+        result = server.get_episode_details(low=low, high=high, data=data)
+        assert result == reference_episode_details(data, low, high)
+
+
+@pytest.mark.parametrize("order", ["newest_first", "oldest_first", "shuffled"])
+@pytest.mark.parametrize("seed", range(6))
+def test_detect_episodes_match_reference(server, seed, order):
+    data = make_data(seed, order=order)
+    for low, high in THRESHOLDS:
+        result = server.detect_episodes(low=low, high=high, data=data)
+        assert result["readings_analyzed"] == len(data)
+        assert result["episodes"] == reference_detect_episodes(data, low, high)
+
+
+@pytest.mark.parametrize("n", [1, 2, 7])
+def test_short_series(server, n):
+    data = make_data(42, n=n)
+    assert server.get_episode_details(data=data) == reference_episode_details(data, 70, 180)
+    assert server.detect_episodes(data=data)["episodes"] == reference_detect_episodes(data, 70, 180)
+
+
+def test_absent_metrics_are_none(server):
+    # A single low reading at the end: no rates, no recovery window
+    data = [
+        {"glucose_mg_dl": 120, "timestamp": "2026-03-01T00:00:00Z"},
+        {"glucose_mg_dl": 60, "timestamp": "2026-03-01T00:05:00Z"},
+    ]
+    (episode,) = server.get_episode_details(data=data)["episodes"]
+    assert episode["rate_to_extreme_per_5min"] is None
+    assert episode["rate_from_extreme_per_5min"] is None
+    assert episode["recovery_minutes"] is None
+    assert episode["recovery_rate_per_5min"] is None
+    assert episode["overcorrection"] is None
+    assert episode["leadup_values"] == [120]
+
+
+def test_rebound_after_low(server):
+    values = [100, 65, 50, 62, 90, 150, 200, 210, 170]
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    data = [
+        {"glucose_mg_dl": v, "timestamp": (start + timedelta(minutes=5 * i)).isoformat()}
+        for i, v in enumerate(values)
+    ]
+    episodes = server.get_episode_details(data=data)["episodes"]
+    assert [e["type"] for e in episodes] == ["very_low", "high"]
+    episode = episodes[0]
+    assert episode["extreme_value"] == 50
+    assert episode["duration_minutes"] == 10
+    assert episode["recovery_minutes"] == 5
+    assert episode["overcorrection"] == {"type": "rebound_high", "value": 210}
+    assert episode == reference_episode_details(data, 70, 180)["episodes"][0]